@@ -1,9 +1,12 @@
+import base64
 import logging
+import mmap
 import tempfile
 import zipfile
 from pathlib import Path
 
 import numpy as np
+import orjson
 import pandas as pd
 
 logger = logging.getLogger(__name__)
@@ -130,6 +133,38 @@ def read_binary_file_from_url(url):
     return None
 
 
+def iter_json_lines(path):
+    """
+    Yield one parsed object per non-empty line of a JSON-lines artifact file.
+
+    The file is memory-mapped and each line is handed to orjson as bytes, so
+    neither the whole file nor per-line str copies are held on the heap.
+    """
+    with open(path, 'rb') as f:
+        if Path(path).stat().st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            size = len(mm)
+            while start < size:
+                end = mm.find(b'\n', start)
+                if end < 0:
+                    end = size
+                if end > start:
+                    yield orjson.loads(mm[start:end])
+                start = end + 1
+
+
+def encode_array(a, dtype=np.float32):
+    """Encode a numeric array as base64 of its raw C-ordered bytes in ``dtype``."""
+    return base64.b64encode(np.ascontiguousarray(a, dtype=dtype).tobytes()).decode()
+
+
+def decode_array(s, shape, dtype=np.float32):
+    """Inverse of encode_array. The returned array is read-only."""
+    return np.frombuffer(base64.b64decode(s), dtype=dtype).reshape(shape)
+
+
 def load_dataset_by_run(run_id):
     combined_csv_file = read_file_from_url(gen_dataset_url(run_id) + 'dataset')
     if combined_csv_file:
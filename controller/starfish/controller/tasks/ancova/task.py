@@ -12,29 +12,140 @@ Statistical outputs:
 
 Federated approach:
 - Each site computes local OLS (Ordinary Least Squares) regression with group dummies + covariates
-- Sites share: coefficients, standard errors, sample size, SS components
-- Coordinator aggregates via inverse-variance weighted meta-analysis
+- Sites share: coefficients, standard errors, sample size, SS components, and the
+  sufficient statistics X'X, X'y, y'y, sum(y) and n
+- Coordinator sums the sufficient statistics and solves the global OLS exactly; if any
+  site did not send them it falls back to inverse-variance weighted meta-analysis
 """
 
-import json
 from pathlib import Path
 
 import numpy as np
+import orjson
+import scipy.linalg
 from scipy import stats as scipy_stats
-import statsmodels.api as sm
+from scipy.linalg.blas import dgemv, dsyrk
+from threadpoolctl import ThreadpoolController
 
 from starfish.controller.file.file_utils import (
     gen_mid_artifacts_url, gen_all_mid_artifacts_url, gen_artifacts_url,
-    downloaded_artifacts_url
+    encode_array, decode_array, iter_json_lines
 )
 from starfish.controller.tasks.abstract_task import AbstractTask
-from sklearn.model_selection import train_test_split
 import warnings
 
 warnings.filterwarnings('ignore')
 
 MIN_SAMPLE_SIZE = 30
 
+# Inspecting the loaded BLAS libraries takes milliseconds, so it is done once
+# at import; limiting threads through the controller is then cheap
+_THREADPOOL = ThreadpoolController()
+
+# Per-coefficient fields of a site's statistics that are reported in float32.
+# t- and p-values stay float64: float32 flushes p-values below ~1e-45 to 0.
+FLOAT32_FIELDS = ('coef_', 'std_err', 'conf_int_lower', 'conf_int_upper')
+
+
+def _solve_normal_equations(XtX, Xty):
+    """
+    Solve the normal equations X'X beta = X'y.
+
+    The rank is read off X'X scaled to unit diagonal, so covariates on very
+    different scales do not look collinear. A full-rank system is solved with
+    a Cholesky factorisation; a rank-deficient one (collinear dummies, or a
+    group level with no rows) falls back to the pseudo-inverse, as the pinv
+    based statsmodels OLS did. Returns (beta, (X'X)^-1, rank).
+    """
+    p = len(Xty)
+    d = np.sqrt(np.diag(XtX))
+    d[d == 0.0] = 1.0  # all-zero columns stay zero and count as rank deficient
+    D = np.outer(d, d)
+    C = XtX / D
+    # The rank is the number of eigenvalues the pseudo-inverse below would keep
+    s, U = np.linalg.eigh(C)
+    keep = np.abs(s) > p * np.finfo(np.float64).eps * np.abs(s).max()
+    rank = int(keep.sum())
+    if rank == p:
+        try:
+            cho = scipy.linalg.cho_factor(XtX)
+            return scipy.linalg.cho_solve(cho, Xty), scipy.linalg.cho_solve(cho, np.eye(p)), rank
+        except np.linalg.LinAlgError:
+            pass  # not numerically positive definite; solve via the same eigenvalues
+    XtX_pinv = ((U[:, keep] / s[keep]) @ U[:, keep].T) / D
+    return XtX_pinv @ Xty, XtX_pinv, rank
+
+
+def _ols_summary(beta, XtX_inv_diag, rank, ssr, tss, n) -> dict:
+    """
+    Derive standard errors, t-statistics and fit statistics of an OLS fit with
+    an intercept from the coefficients, the diagonal of (X'X)^-1, the rank of
+    X, the residual and (centred) total sums of squares and the number of
+    rows. Quantities that are undefined (no residual degrees of freedom, a
+    constant outcome) come out as NaN.
+    """
+    ess = tss - ssr
+    df_resid = n - rank
+    df_model = rank - 1
+
+    sigma2 = ssr / df_resid if df_resid > 0 else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se = np.sqrt(sigma2 * XtX_inv_diag)
+        t = beta / se
+        f_statistic = np.float64(ess / df_model) / sigma2 if df_model > 0 else np.nan
+
+    return {
+        'beta': beta,
+        'ssr': ssr,
+        'ess': ess,
+        'XtX_inv_diag': XtX_inv_diag,
+        'se': se,
+        't': t,
+        'n': n,
+        'df_resid': df_resid,
+        'df_model': df_model,
+        'r_squared': ess / tss if tss > 0 else np.nan,
+        'f_statistic': f_statistic,
+    }
+
+
+def _merge_moments(a, b) -> dict:
+    """
+    Pairwise (Chan et al.) merge of two sets' centred moments: the count n,
+    the means of X and y, and the centred cross-products Sxx = Xc'Xc,
+    Sxy = Xc'yc and Syy = yc'yc. Unlike summing raw X'X and y'y this keeps
+    its precision when the data sit far from the origin.
+    """
+    n = a['n'] + b['n']
+    dx = b['mean_x'] - a['mean_x']
+    dy = b['mean_y'] - a['mean_y']
+    w = a['n'] * b['n'] / n
+    return {
+        'n': n,
+        'mean_x': a['mean_x'] + dx * (b['n'] / n),
+        'mean_y': a['mean_y'] + dy * (b['n'] / n),
+        'Sxx': a['Sxx'] + b['Sxx'] + w * np.outer(dx, dx),
+        'Sxy': a['Sxy'] + b['Sxy'] + w * dx * dy,
+        'Syy': a['Syy'] + b['Syy'] + w * dy * dy,
+    }
+
+
+def _centred_ols(moments, ssr=None) -> dict:
+    """
+    OLS with an intercept from centred moments (see _merge_moments). The
+    slopes solve Sxx b = Sxy, the intercept is mean_y - mean_x'b and its
+    variance factor is 1/n + mean_x' Sxx^-1 mean_x. Without a residual sum of
+    squares computed from the data, SSR is taken as Syy - b'Sxy.
+    """
+    n, mean_x = moments['n'], moments['mean_x']
+    slopes, Sxx_inv, rank = _solve_normal_equations(moments['Sxx'], moments['Sxy'])
+    beta = np.concatenate([[moments['mean_y'] - mean_x @ slopes], slopes])
+    XtX_inv_diag = np.concatenate([[1.0 / n + mean_x @ Sxx_inv @ mean_x], np.diag(Sxx_inv)])
+    if ssr is None:
+        ssr = max(moments['Syy'] - float(slopes @ moments['Sxy']), 0.0)
+    # the intercept adds one to the rank of the centred design
+    return _ols_summary(beta, XtX_inv_diag, rank + 1, ssr, moments['Syy'], n)
+
 
 class Ancova(AbstractTask):
     """
@@ -56,8 +167,9 @@ class Ancova(AbstractTask):
         self.sample_size = None
         self.X = None
         self.y = None
-        self.X_with_const = None
-        self.model_result = None
+        self.tr_idx = None
+        self.te_idx = None
+        self._core = None
         self.n_group_cols = 1  # default, can be overridden by config
 
     def prepare_data(self) -> bool:
@@ -81,33 +193,21 @@ class Ancova(AbstractTask):
         task_config = self.tasks[self.cur_seq - 1].get('config', {})
         self.n_group_cols = task_config.get('n_group_columns', 1)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        self.X = X_train
-        self.y = y_train
-        self.X_test = X_test
-        self.y_test = y_test
+        # Split data (80/20, same sizes as train_test_split(test_size=0.2))
+        n = len(y)
+        idx = np.random.default_rng(42).permutation(n)
+        cut = n - int(np.ceil(0.2 * n))
+        self.tr_idx, self.te_idx = idx[:cut], idx[cut:]
         
-        # Add constant for statsmodels OLS
-        self.X_with_const = sm.add_constant(self.X)
+        self.X = np.asarray(X[self.tr_idx], dtype=np.float64)
+        self.y = np.asarray(y[self.tr_idx], dtype=np.float64)
+        self.X_test = X[self.te_idx]
+        self.y_test = y[self.te_idx]
         
         self.logger.debug(f'Training data shape: {self.X.shape}')
         self.logger.debug(f'Training label shape: {self.y.shape}')
         self.logger.debug(f'Number of group columns: {self.n_group_cols}')
         
-        # Load previous round artifacts if not first round
-        if not self.is_first_round():
-            seq_no, round_no = self.get_previous_seq_and_round()
-            directory = downloaded_artifacts_url(self.run_id, seq_no, round_no)
-            for path in Path(directory).rglob("*-{}-{}-artifacts".format(seq_no, round_no)):
-                with open(str(path), 'r') as f:
-                    for line in f:
-                        prev_model = json.loads(line)
-                        self.logger.debug(f"Loaded previous artifacts: {prev_model.keys()}")
-        
         return True
 
     def validate(self) -> bool:
@@ -126,71 +226,145 @@ class Ancova(AbstractTask):
         self.logger.info('Starting ANCOVA analysis...')
         
         try:
-            # Fit OLS model
-            model = sm.OLS(self.y, self.X_with_const)
-            self.model_result = model.fit()
-            
-            self.logger.info(f'Model fitted. R² = {self.model_result.rsquared:.4f}')
-            
-            # Calculate and save statistics
-            stats = self.calculate_statistics()
+            # ANCOVA designs are tiny (p ~ 10), where multithreaded BLAS spends
+            # more time spinning up threads than computing
+            with _THREADPOOL.limit(limits=1, user_api='blas'):
+                # Fit OLS model
+                self._core = self._fit_core()
+                
+                self.logger.info(f'Model fitted. R² = {self._core["r_squared"]:.4f}')
+                
+                # Calculate and save statistics
+                stats = self.calculate_statistics()
             
             url = gen_mid_artifacts_url(self.run_id, self.cur_seq, self.get_round())
             self.logger.info(f"Saving mid-artifacts to: {url}")
             
-            return self.save_artifacts(url, json.dumps(stats))
+            return self.save_artifacts(url, orjson.dumps(stats, option=orjson.OPT_SERIALIZE_NUMPY).decode())
             
         except Exception as e:
             self.logger.error(f'Error during ANCOVA training: {e}')
             return False
 
+    def _fit_core(self) -> dict:
+        """
+        Fit OLS by solving the normal equations (see _solve_normal_equations).
+
+        The centred moments of X and y are formed once; coefficients,
+        residuals, SS components, standard errors and t-statistics are all
+        derived from that single solve and returned together so that
+        calculate_statistics and _calculate_partial_eta_squared never
+        recompute them. The moments are kept as well: they are this site's
+        sufficient statistics.
+
+        Centring absorbs the intercept, so its column is never materialised,
+        and keeps the cross-products accurate when the data have a large
+        offset.
+        """
+        X = np.asarray(self.X, dtype=np.float64)
+        y = np.asarray(self.y, dtype=np.float64)
+        n, k = X.shape
+        mean_x = X.mean(axis=0)
+        mean_y = float(y.mean())
+        Xc = X - mean_x
+        yc = y - mean_y
+        # A C-ordered Xc is a Fortran-ordered Xc', which BLAS takes without a copy
+        Xct = Xc.T
+
+        # Symmetric rank-k update fills only the upper triangle of Xc'Xc
+        G = dsyrk(1.0, Xct)
+        moments = {
+            'n': n,
+            'mean_x': mean_x,
+            'mean_y': mean_y,
+            'Sxx': np.triu(G) + np.triu(G, 1).T,
+            'Sxy': dgemv(1.0, Xct, yc),
+            'Syy': float(yc @ yc),
+        }
+        slopes, _, rank = _solve_normal_equations(moments['Sxx'], moments['Sxy'])
+        if rank < k:
+            self.logger.warning(f'Design matrix is rank deficient (rank {rank + 1} of {k + 1}); '
+                                'using the pseudo-inverse solution')
+
+        resid = yc - dgemv(1.0, Xct, slopes, trans=1)
+        core = _centred_ols(moments, ssr=float(resid @ resid))
+        core.update({
+            'resid': resid,
+            'moments': moments,
+        })
+        return core
+
     def calculate_statistics(self) -> dict:
         """
         Calculate ANCOVA statistics for federated aggregation.
         """
-        result = self.model_result
+        core = self._core
+        stats = self._statistics_from_core(core)
+        # float32 is ample precision for reporting and serialises to roughly
+        # half the characters; the sufficient statistics below stay float64
+        for key in FLOAT32_FIELDS:
+            stats[key] = stats[key].astype(np.float32)
+        
+        # Log key results
+        self.logger.info(f'Coefficients: {stats["coef_"]}')
+        self.logger.info(f'Standard Errors: {stats["std_err"]}')
+        self.logger.info(f'P-values: {stats["p_values"]}')
+        self.logger.info(f'R²: {stats["r_squared"]:.4f}, Adj R²: {stats["adj_r_squared"]:.4f}')
+        self.logger.info(f'F-statistic: {stats["f_statistic"]:.4f}, p = {stats["f_pvalue"]:.6f}')
+        self.logger.info(f'Partial η² (group effect): {stats["partial_eta_squared"]:.4f}')
+        
+        return {
+            "sample_size": int(self.sample_size * 0.8),  # training size after split
+            **stats,
+            "n_group_columns": self.n_group_cols,
+            # Sufficient statistics for the exact pooled fit
+            "n_obs": core['n'],
+            "mean_x_b64": encode_array(core['moments']['mean_x'], np.float64),
+            "mean_y": core['moments']['mean_y'],
+            "Sxx_b64": encode_array(core['moments']['Sxx'], np.float64),
+            "Sxy_b64": encode_array(core['moments']['Sxy'], np.float64),
+            "Syy": core['moments']['Syy'],
+        }
+
+    def _statistics_from_core(self, core) -> dict:
+        """
+        Turn the quantities of an OLS fit (see _ols_summary) into the reported
+        inference and fit statistics. Per-coefficient values are left as NumPy
+        arrays; orjson serialises them directly.
+        """
+        beta, se, t = core['beta'], core['se'], core['t']
+        df_residual = core['df_resid']  # degrees of freedom for residuals
+        df_model = core['df_model']  # degrees of freedom for the model
         
         # Basic coefficients and inference
-        coef = result.params.tolist() # coefficients: the estimated effects (weights) for each variable in the model
-        std_err = result.bse.tolist() # the standard errors for each coefficient
-        t_values = result.tvalues.tolist() # t-statistics for each coefficient
-        p_values = result.pvalues.tolist() # p-values for each coefficient
-        conf_int = result.conf_int().tolist() # confidence intervals for each coefficient
+        t_crit = scipy_stats.t.ppf(0.975, df_residual)
+        coef = beta # coefficients: the estimated effects (weights) for each variable in the model
+        std_err = se # the standard errors for each coefficient
+        t_values = t # t-statistics for each coefficient
+        p_values = 2 * scipy_stats.t.sf(np.abs(t), df_residual) # p-values for each coefficient
         
         # Model fit statistics
-        r_squared = result.rsquared  # the proportion of variance explained by the model
-        adj_r_squared = result.rsquared_adj # adjusted R²
-        f_statistic = result.fvalue  # F-statistic for overall model fit
-        f_pvalue = result.f_pvalue   # p-value for the F-statistic
+        r_squared = float(core['r_squared'])  # the proportion of variance explained by the model
+        adj_r_squared = 1 - (1 - r_squared) * (core['n'] - 1) / df_residual if df_residual > 0 else float('nan') # adjusted R²
+        f_statistic = float(core['f_statistic'])  # F-statistic for overall model fit
+        f_pvalue = float(scipy_stats.f.sf(f_statistic, df_model, df_residual))
         
         # Sum of squares for meta-analysis
-        ss_residual = result.ssr  # sum of squared residuals
-        ss_model = result.ess    # explained sum of squares (regression SS)
+        ss_residual = core['ssr']  # sum of squared residuals
+        ss_model = core['ess']    # explained sum of squares (regression SS)
         ss_total = ss_residual + ss_model  # total variance in the outcome
         
-        df_residual = result.df_resid  # degrees of freedom for residuals
-        df_model = result.df_model  # degrees of freedom for the model
-        
         # Calculate partial eta-squared for group effect
         # Group columns are indices 1 to n_group_cols (after constant)
-        partial_eta_sq = self._calculate_partial_eta_squared()
-        
-        # Log key results
-        self.logger.info(f'Coefficients: {coef}')
-        self.logger.info(f'Standard Errors: {std_err}')
-        self.logger.info(f'P-values: {p_values}')
-        self.logger.info(f'R²: {r_squared:.4f}, Adj R²: {adj_r_squared:.4f}')
-        self.logger.info(f'F-statistic: {f_statistic:.4f}, p = {f_pvalue:.6f}')
-        self.logger.info(f'Partial η² (group effect): {partial_eta_sq:.4f}')
+        partial_eta_sq = self._calculate_partial_eta_squared(core)
         
         return {
-            "sample_size": int(self.sample_size * 0.8),  # training size after split
             "coef_": coef,
             "std_err": std_err,
             "t_values": t_values,
             "p_values": p_values,
-            "conf_int_lower": [ci[0] for ci in conf_int],
-            "conf_int_upper": [ci[1] for ci in conf_int],
+            "conf_int_lower": beta - t_crit * se,
+            "conf_int_upper": beta + t_crit * se,
             "r_squared": r_squared,
             "adj_r_squared": adj_r_squared,
             "f_statistic": f_statistic,
@@ -198,13 +372,12 @@ class Ancova(AbstractTask):
             "ss_model": ss_model,
             "ss_residual": ss_residual,
             "ss_total": ss_total,
-            "df_model": df_model,
-            "df_residual": df_residual,
+            "df_model": float(df_model),
+            "df_residual": float(df_residual),
             "partial_eta_squared": partial_eta_sq,
-            "n_group_columns": self.n_group_cols
         }
 
-    def _calculate_partial_eta_squared(self) -> float:
+    def _calculate_partial_eta_squared(self, core=None) -> float:
         """
         Calculate partial eta-squared for the group effect.
         partial η² = SS_effect / (SS_effect + SS_error)
@@ -212,34 +385,35 @@ class Ancova(AbstractTask):
         For ANCOVA, we need Type III SS which requires fitting reduced models.
         Here we use a simplified approach based on the t-statistics of group coefficients.
         """
-        result = self.model_result
+        core = self._core if core is None else core
+        t_all = core['t']
         
         # Group coefficients are at indices 1 to n_group_cols (0 is constant)
-        group_indices = list(range(1, self.n_group_cols + 1))
-        
-        if len(group_indices) == 0 or max(group_indices) >= len(result.params):
+        if self.n_group_cols < 1 or self.n_group_cols >= len(t_all):
             return 0.0
         
         # Approximate partial eta-squared using t² / (t² + df_residual)
         # This is valid for single-df effects
-        t_squared_sum = sum(result.tvalues[i] ** 2 for i in group_indices if i < len(result.tvalues))
-        df_resid = result.df_resid
-        
-        partial_eta_sq = t_squared_sum / (t_squared_sum + df_resid) if (t_squared_sum + df_resid) > 0 else 0.0
+        t = t_all[1:1 + self.n_group_cols]
+        t = t[np.isfinite(t)]  # unidentified (rank-deficient) coefficients have no t
+        t2s = float(t @ t)
+        denom = t2s + core['df_resid']
         
-        return partial_eta_sq
+        return t2s / denom if denom > 0 else 0.0
 
     def do_aggregate(self) -> bool:
         """
-        Aggregate ANCOVA results from all sites using inverse-variance weighted meta-analysis.
+        Aggregate ANCOVA results from all sites.
+
+        When every site sent its sufficient statistics the global OLS is solved
+        exactly; otherwise the sites' fits are pooled by inverse-variance
+        weighted meta-analysis.
         """
         download_mid_artifacts = []
         directory = gen_all_mid_artifacts_url(self.project_id, self.batch_id)
         
         for path in Path(directory).rglob("*-{}-{}-mid-artifacts".format(self.cur_seq, self.get_round())):
-            with open(str(path), 'r') as f:
-                for line in f:
-                    download_mid_artifacts.append(json.loads(line))
+            download_mid_artifacts.extend(iter_json_lines(path))
 
         self.logger.debug(f"Downloaded {len(download_mid_artifacts)} mid-artifacts")
         
@@ -247,75 +421,114 @@ class Ancova(AbstractTask):
             self.logger.warning("No mid-artifacts found for aggregation")
             return False
 
-        # Inverse-variance weighted meta-analysis
-        n_coef = len(download_mid_artifacts[0]['coef_'])
-        
-        pooled_coef = []
-        pooled_se = []
-        pooled_z = []
-        pooled_pvalues = []
-        pooled_ci_lower = []
-        pooled_ci_upper = []
+        if all('Sxx_b64' in a for a in download_mid_artifacts):
+            aggregated_stats = self._pool_sufficient_statistics(download_mid_artifacts)
+        else:
+            self.logger.info("Not every site sent sufficient statistics; "
+                             "falling back to inverse-variance weighted meta-analysis")
+            aggregated_stats = self._pool_inverse_variance(download_mid_artifacts)
+
+        url = gen_artifacts_url(self.run_id, self.cur_seq, self.get_round())
+        self.logger.info(f"Saving aggregated artifacts to: {url}")
         
-        total_sample_size = sum(a['sample_size'] for a in download_mid_artifacts)
+        if self.save_artifacts(url, orjson.dumps(aggregated_stats, option=orjson.OPT_SERIALIZE_NUMPY).decode()):
+            self.upload(True)
+            return True
         
-        # Pool each coefficient separately
-        for i in range(n_coef):
-            coefs = [a['coef_'][i] for a in download_mid_artifacts]
-            std_errs = [a['std_err'][i] for a in download_mid_artifacts]
-            
-            # Inverse variance weights
-            weights = [1 / (se ** 2) if se > 0 else 0 for se in std_errs]
-            total_weight = sum(weights)
-            
-            if total_weight > 0:
-                # Pooled coefficient
-                pooled_b = sum(c * w for c, w in zip(coefs, weights)) / total_weight
-                # Pooled standard error
-                pooled_stderr = np.sqrt(1 / total_weight)
-                # Z-score and p-value
-                z = pooled_b / pooled_stderr if pooled_stderr > 0 else 0
-                p = 2 * (1 - scipy_stats.norm.cdf(abs(z)))
-                # 95% CI
-                ci_lower = pooled_b - 1.96 * pooled_stderr
-                ci_upper = pooled_b + 1.96 * pooled_stderr
-            else:
-                pooled_b = np.mean(coefs)
-                pooled_stderr = 0
-                z = 0
-                p = 1.0
-                ci_lower = pooled_b
-                ci_upper = pooled_b
-            
-            pooled_coef.append(pooled_b)
-            pooled_se.append(pooled_stderr)
-            pooled_z.append(z)
-            pooled_pvalues.append(p)
-            pooled_ci_lower.append(ci_lower)
-            pooled_ci_upper.append(ci_upper)
+        return False
+
+    def _pool_sufficient_statistics(self, download_mid_artifacts) -> dict:
+        """
+        Exact pooled OLS: the sites' centred moments are merged pairwise into
+        those of the concatenated data, which give the same fit as OLS on it.
+        """
+        k = len(download_mid_artifacts[0]['coef_']) - 1
+        moments = None
+        for a in download_mid_artifacts:
+            site = {
+                'n': a['n_obs'],
+                'mean_x': decode_array(a['mean_x_b64'], (k,), np.float64),
+                'mean_y': a['mean_y'],
+                'Sxx': decode_array(a['Sxx_b64'], (k, k), np.float64),
+                'Sxy': decode_array(a['Sxy_b64'], (k,), np.float64),
+                'Syy': a['Syy'],
+            }
+            moments = site if moments is None else _merge_moments(moments, site)
+        n = moments['n']
+
+        with _THREADPOOL.limit(limits=1, user_api='blas'):
+            core = _centred_ols(moments)
+            stats = self._statistics_from_core(core)
+
+        self.logger.info("=== Aggregated ANCOVA Results (pooled OLS) ===")
+        self.logger.info(f"Total sample size: {n}")
+        self.logger.info(f"Pooled coefficients: {stats['coef_']}")
+        self.logger.info(f"Pooled standard errors: {stats['std_err']}")
+        self.logger.info(f"Pooled p-values: {stats['p_values']}")
+        self.logger.info(f"Pooled R²: {stats['r_squared']:.4f}")
+        self.logger.info(f"Pooled F-statistic: {stats['f_statistic']:.4f}, p = {stats['f_pvalue']:.6f}")
+        self.logger.info(f"Pooled partial η²: {stats['partial_eta_squared']:.4f}")
+
+        return {
+            "method": "pooled_ols",
+            "total_sample_size": n,
+            "n_sites": len(download_mid_artifacts),
+            **stats,
+        }
+
+    def _pool_inverse_variance(self, download_mid_artifacts) -> dict:
+        """
+        Inverse-variance weighted meta-analysis of the sites' coefficients, with
+        SS components summed across sites.
+        """
+        # One pass over the site dicts for every per-site scalar
+        sizes, ss_model, ss_residual, df_residual, eta = np.array([
+            (a['sample_size'], a['ss_model'], a['ss_residual'], a['df_residual'], a['partial_eta_squared'])
+            for a in download_mid_artifacts
+        ], dtype=np.float64).T
+        total_sample_size = int(sizes.sum())
+        
+        # Inverse-variance weighted meta-analysis, all coefficients at once
+        C = np.array([a['coef_'] for a in download_mid_artifacts], dtype=np.float64)  # (n_sites, n_coef)
+        SE = np.array([a['std_err'] for a in download_mid_artifacts], dtype=np.float64)
+        
+        # Inverse variance weights (zero for sites with a non-positive SE)
+        with np.errstate(divide='ignore'):
+            W = np.where(SE > 0, 1.0 / (SE * SE), 0.0)
+        total_weight = W.sum(axis=0)
+        has_weight = total_weight > 0
+        safe_weight = np.where(has_weight, total_weight, 1.0)
+        
+        # Coefficients without any usable weight fall back to the plain mean,
+        # with zero standard error, z = 0 and p = 1
+        pooled_coef = np.where(has_weight, (C * W).sum(axis=0) / safe_weight, C.mean(axis=0))
+        pooled_se = np.where(has_weight, np.sqrt(1.0 / safe_weight), 0.0)
+        pooled_z = np.where(pooled_se > 0, pooled_coef / np.where(pooled_se > 0, pooled_se, 1.0), 0.0)
+        pooled_pvalues = np.where(has_weight, 2 * scipy_stats.norm.sf(np.abs(pooled_z)), 1.0)
+        # 95% CI
+        pooled_ci_lower = pooled_coef - 1.96 * pooled_se
+        pooled_ci_upper = pooled_coef + 1.96 * pooled_se
 
         # Pool SS components (simple sum for SS, weighted for others)
-        total_ss_model = sum(a['ss_model'] for a in download_mid_artifacts)
-        total_ss_residual = sum(a['ss_residual'] for a in download_mid_artifacts)
+        total_ss_model = float(ss_model.sum())
+        total_ss_residual = float(ss_residual.sum())
         total_ss_total = total_ss_model + total_ss_residual
         
         total_df_model = download_mid_artifacts[0]['df_model']  # same across sites
-        total_df_residual = sum(a['df_residual'] for a in download_mid_artifacts)
+        total_df_residual = float(df_residual.sum())
         
         # Pooled F-statistic
         ms_model = total_ss_model / total_df_model if total_df_model > 0 else 0
         ms_residual = total_ss_residual / total_df_residual if total_df_residual > 0 else 1
         pooled_f = ms_model / ms_residual if ms_residual > 0 else 0
-        pooled_f_pvalue = 1 - scipy_stats.f.cdf(pooled_f, total_df_model, total_df_residual)
+        pooled_f_pvalue = scipy_stats.f.sf(pooled_f, total_df_model, total_df_residual)
         
         # Pooled R²
         pooled_r_squared = total_ss_model / total_ss_total if total_ss_total > 0 else 0
         pooled_adj_r_squared = 1 - (1 - pooled_r_squared) * (total_sample_size - 1) / (total_sample_size - total_df_model - 1)
         
         # Pooled partial eta-squared (weighted average)
-        pooled_partial_eta = sum(
-            a['partial_eta_squared'] * a['sample_size'] for a in download_mid_artifacts
-        ) / total_sample_size if total_sample_size > 0 else 0
+        pooled_partial_eta = float(eta @ sizes) / total_sample_size if total_sample_size > 0 else 0
 
         # Log aggregated results
         self.logger.info("=== Aggregated ANCOVA Results ===")
@@ -327,7 +540,8 @@ class Ancova(AbstractTask):
         self.logger.info(f"Pooled F-statistic: {pooled_f:.4f}, p = {pooled_f_pvalue:.6f}")
         self.logger.info(f"Pooled partial η²: {pooled_partial_eta:.4f}")
 
-        aggregated_stats = {
+        return {
+            "method": "inverse_variance",
             "total_sample_size": total_sample_size,
             "n_sites": len(download_mid_artifacts),
             "coef_": pooled_coef,
@@ -347,12 +561,3 @@ class Ancova(AbstractTask):
             "df_residual": total_df_residual,
             "partial_eta_squared": pooled_partial_eta
         }
-
-        url = gen_artifacts_url(self.run_id, self.cur_seq, self.get_round())
-        self.logger.info(f"Saving aggregated artifacts to: {url}")
-        
-        if self.save_artifacts(url, json.dumps(aggregated_stats)):
-            self.upload(True)
-            return True
-        
-        return False
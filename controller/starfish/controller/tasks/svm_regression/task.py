@@ -1,23 +1,65 @@
-import json
 from pathlib import Path
 
 import numpy
 import numpy as np
+import orjson
 
 from starfish.controller.file.file_utils import gen_mid_artifacts_url, gen_all_mid_artifacts_url, gen_artifacts_url, \
-    downloaded_artifacts_url
+    downloaded_artifacts_url, encode_array, decode_array, iter_json_lines
 from starfish.controller.tasks.abstract_task import AbstractTask
-import sklearn.svm
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import make_pipeline
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import warnings
 
 warnings.filterwarnings('ignore')
 
-# NOTE: Implementation is not completed yet.
+# Number of random Fourier features approximating the RBF kernel
+N_COMPONENTS = 200
+
+
+def _merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+    Pairwise (Chan et al.) merge of two sets' count, per-feature mean and
+    centred sum of squares M2. Unlike sum(X^2)/n - mean^2 it stays accurate
+    when a feature's mean is large relative to its spread.
+    """
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + delta * delta * (n_a * n_b / n)
+    return n, mean, m2
+
+
+def _scaler_std(n, m2):
+    """Standard deviation (ddof=0, as StandardScaler) from the centred sum of squares."""
+    std = np.sqrt(m2 / n)
+    std[std == 0.0] = 1.0  # constant features are left unscaled
+    return std
+
 
 class SvmRegression(AbstractTask):   # Also called Support Vector Regression (SVR)
+    """
+    Kernel SVR approximated by a linear epsilon-insensitive SVR on random
+    Fourier features of an RBF kernel.
+
+    Exact SVR is O(n^2)-O(n^3) in the number of samples and its model (support
+    vectors and dual coefficients) cannot be averaged across sites. Here every
+    site maps its standardised features through the same RBFSampler (same
+    seed, same gamma), so the SGDRegressor weights live in a shared feature
+    space and are federated by sample-size weighted averaging. The weights are
+    exchanged as base64-encoded float32 bytes rather than JSON number lists.
+
+    Features are standardised with global statistics: every site uploads the
+    count, per-feature mean and centred sum of squares of its training rows,
+    the coordinator merges them into a global mean/std and broadcasts them with
+    the averaged weights, and later rounds scale with those instead of local
+    statistics. The first round has no global statistics yet and scales with
+    each site's own, so its weights are averaged over feature spaces that only
+    roughly agree; with total_round=1 that is the only round, and the global
+    scaler is published but never used for fitting.
+    """
 
     def __init__(self, run):
         super().__init__(run)
@@ -25,9 +67,24 @@ class SvmRegression(AbstractTask):   # Also called Support Vector Regression (SV
         self.svmRegr = None
         self.X_train_scaled = None
         self.y_train = None
+        self.X_test = None
         self.X_test_scaled = None
         self.y_test = None
-        
+        self.n_train = None
+        self.mean_x = None
+        self.m2_x = None
+        self.tr_idx = None
+        self.te_idx = None
+        self.coef_init = None
+        self.intercept_init = None
+
+    def _build_model(self, n_features):
+        return make_pipeline(
+            RBFSampler(gamma=1.0 / n_features, n_components=N_COMPONENTS, random_state=42),
+            SGDRegressor(loss='epsilon_insensitive', epsilon=0.1, alpha=1e-4,
+                         max_iter=1000, random_state=42),
+        )
+
     def prepare_data(self) -> bool:
         # load dataset
         self.logger.debug('Loading dataset for run {} ...'.format(self.run_id))
@@ -35,39 +92,50 @@ class SvmRegression(AbstractTask):   # Also called Support Vector Regression (SV
         if X is not None and len(X) > 0 and y is not None and len(y) > 0:
             self.sample_size = len(y)
             # Split the data into training and testing sets
-            X_train, X_test, self.y_train, self.y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42)
+            # (80/20, same sizes as train_test_split(test_size=0.2))
+            n = len(y)
+            idx = np.random.default_rng(42).permutation(n)
+            cut = n - int(np.ceil(0.2 * n))
+            self.tr_idx, self.te_idx = idx[:cut], idx[cut:]
+            X = np.asarray(X, dtype=np.float64)
+            X_train, self.X_test = X[self.tr_idx], X[self.te_idx]
+            self.y_train, self.y_test = y[self.tr_idx], y[self.te_idx]
 
-            # Standardize the numerical features
-            scaler = StandardScaler()
-            self.X_train_scaled = scaler.fit_transform(X_train)
-            self.X_test_scaled = scaler.transform(X_test)
-            self.logger.debug(
-                f'Training data shape: {self.X_train_scaled.shape}')
-            self.logger.debug(f'Training label shape: {self.y_train.shape}')
-            self.logger.debug(f'Test data shape: {self.X_test_scaled.shape}')
-            self.logger.debug(f'Test label shape: {self.y_test.shape}')
+            # Moments for the federated scaler, from the training copy
+            # centred in place (X_train is a fancy-indexed copy)
+            self.n_train = len(self.tr_idx)
+            self.mean_x = X_train.mean(axis=0)
+            X_train -= self.mean_x
+            self.m2_x = np.einsum('ij,ij->j', X_train, X_train)
+            mean, std = self.mean_x, _scaler_std(self.n_train, self.m2_x)
 
-            # Initialize SVM regression model
-            self.svmRegr = sklearn.svm.SVR(
-                kernel='rbf',
-                C=1.0,
-                epsilon=0.1,
-            )
+            # Initialize approximate SVM regression model
+            self.svmRegr = self._build_model(X_train.shape[1])
             if not self.is_first_round():
                 seq_no, round_no = self.get_previous_seq_and_round()
                 directory = downloaded_artifacts_url(
                     self.run_id, seq_no, round_no)
                 for path in Path(directory).rglob("*-{}-{}-artifacts".format(seq_no, round_no)):
-                    with open(str(path), 'r') as f:
-                        for line in f:
-                            model = json.loads(line)
-                            self.svmRegr.support_vectors_ = np.asarray(
-                                model['support_vectors_'])
-                            self.svmRegr.dual_coef_ = np.asarray(
-                                model['dual_coef_'])
-                            self.svmRegr.intercept_ = np.asarray(
-                                model['intercept_'])
+                    for model in iter_json_lines(path):
+                        self.coef_init = decode_array(
+                            model['coef_b64'], model['coef_shape']).astype(np.float64)
+                        self.intercept_init = np.asarray(
+                            [model['intercept_']])
+                        if 'scaler_mean' in model:
+                            mean = np.asarray(model['scaler_mean'], dtype=np.float64)
+                            std = np.asarray(model['scaler_std'], dtype=np.float64)
+
+            # Standardize the numerical features
+            if mean is not self.mean_x:
+                X_train -= mean - self.mean_x
+            X_train /= std
+            self.X_train_scaled = X_train
+            self.X_test_scaled = (self.X_test - mean) / std
+            self.logger.debug(
+                f'Training data shape: {self.X_train_scaled.shape}')
+            self.logger.debug(f'Training label shape: {self.y_train.shape}')
+            self.logger.debug(f'Test data shape: {self.X_test_scaled.shape}')
+            self.logger.debug(f'Test label shape: {self.y_test.shape}')
             return True
         else:
             self.logger.warning("Data set is not ready")
@@ -86,17 +154,22 @@ class SvmRegression(AbstractTask):   # Also called Support Vector Regression (SV
     def training(self) -> bool:
         """
         This step is used for training.
-        SVM regression uses support vectors to define the regression function.
+        The RBF kernel is approximated with random Fourier features and a linear
+        epsilon-insensitive SVR is fitted on them with SGD, warm-started from the
+        previous round's global weights when available.
         """
         self.logger.info('Starting training...')
-        self.svmRegr.fit(self.X_train_scaled, self.y_train)
+        self.svmRegr.fit(self.X_train_scaled, self.y_train,
+                         sgdregressor__coef_init=self.coef_init,
+                         sgdregressor__intercept_init=self.intercept_init)
         score = self.svmRegr.score(self.X_test_scaled, self.y_test)
         self.logger.info(f'Training complete. Model R² score: {score}')
         to_upload = self.calculate_statistics()
+        to_upload.update(n=self.n_train, mean_x=self.mean_x, m2_x=self.m2_x)
         url = gen_mid_artifacts_url(
             self.run_id, self.cur_seq, self.get_round())
         self.logger.info("Upload: {} \n to: {}".format(to_upload, url))
-        return self.save_artifacts(url, json.dumps(to_upload))
+        return self.save_artifacts(url, orjson.dumps(to_upload, option=orjson.OPT_SERIALIZE_NUMPY).decode())
 
     def calculate_statistics(self):
         y_predict = self.svmRegr.predict(self.X_test_scaled)
@@ -114,62 +187,79 @@ class SvmRegression(AbstractTask):   # Also called Support Vector Regression (SV
         r2 = r2_score(self.y_test, y_predict)
         self.logger.info(f'R² Score: {r2}')
 
+        sgd = self.svmRegr[-1]
         return {
             "sample_size": self.sample_size,
-            "dual_coef": self.svmRegr.dual_coef_.tolist(),
-            "intercept": float(self.svmRegr.intercept_[0]),
+            "coef_b64": encode_array(sgd.coef_),
+            "coef_shape": list(sgd.coef_.shape),
+            "intercept_": float(sgd.intercept_[0]),
             "metric_mse": mse,
             "metric_rmse": rmse,
             "metric_mae": mae,
             "metric_r2": r2
         }
 
+    def _pool_scaler(self, download_mid_artifacts):
+        """
+        Merge the per-site scaler moments into the global mean/std that the next
+        round standardises with. The coordinator's own test split is rescaled
+        so the reported metrics refer to the same feature space.
+        """
+        if not all('m2_x' in a for a in download_mid_artifacts):
+            return {}
+        n, mean, m2 = 0, 0.0, 0.0
+        for a in download_mid_artifacts:
+            n, mean, m2 = _merge_moments(n, mean, m2, a['n'],
+                                         np.asarray(a['mean_x'], dtype=np.float64),
+                                         np.asarray(a['m2_x'], dtype=np.float64))
+        std = _scaler_std(n, m2)
+        if self.X_test is not None:
+            self.X_test_scaled = (self.X_test - mean) / std
+        return {"scaler_mean": mean, "scaler_std": std}
+
     def do_aggregate(self) -> bool:
         download_mid_artifacts = []
         directory = gen_all_mid_artifacts_url(self.project_id, self.batch_id)
         for path in Path(directory).rglob("*-{}-{}-mid-artifacts".format(self.cur_seq, self.get_round())):
-            with open(str(path), 'r') as f:
-                for line in f:
-                    download_mid_artifacts.append(json.loads(line))
+            download_mid_artifacts.extend(iter_json_lines(path))
 
         self.logger.debug(
             "Download mid artifacts: {}".format(download_mid_artifacts))
 
         self.sample_size = 0
-        dual_coef = None
-        intercept = None
-        
-        for mid_artifact_dict in download_mid_artifacts:
-            sample = mid_artifact_dict['sample_size']
-            self.sample_size = self.sample_size + sample
-            
-            weighted_dual_coef = numpy.multiply(numpy.asarray(
-                mid_artifact_dict['dual_coef']), sample)
-            weighted_intercept = numpy.multiply(
-                mid_artifact_dict['intercept'], sample)
-            
-            if dual_coef is None:
-                dual_coef = weighted_dual_coef
-            else:
-                dual_coef = numpy.add(dual_coef, weighted_dual_coef)
-            if intercept is None:
-                intercept = weighted_intercept
-            else:
-                intercept = numpy.add(intercept, weighted_intercept)
+        coef = None
+        intercept = 0.0
+
+        if download_mid_artifacts:
+            # Preallocated accumulator and scratch buffer; the float32 weights
+            # are widened to float64 inside the multiply
+            coef = numpy.zeros(download_mid_artifacts[0]['coef_shape'], dtype=numpy.float64)
+            weighted_coef = numpy.empty_like(coef)
+            for mid_artifact_dict in download_mid_artifacts:
+                sample = mid_artifact_dict['sample_size']
+                self.sample_size += sample
+                numpy.multiply(decode_array(mid_artifact_dict['coef_b64'], mid_artifact_dict['coef_shape']),
+                               sample, out=weighted_coef, dtype=numpy.float64)
+                coef += weighted_coef
+                intercept += mid_artifact_dict['intercept_'] * sample
 
-        if dual_coef is not None and intercept is not None:
-            self.svmRegr.dual_coef_ = numpy.divide(dual_coef, self.sample_size)
-            self.svmRegr.intercept_ = numpy.array([numpy.divide(intercept, self.sample_size)])
+        if coef is not None:
+            coef /= self.sample_size
+            sgd = self.svmRegr[-1]
+            sgd.coef_ = coef
+            sgd.intercept_ = numpy.array([intercept / self.sample_size])
+            scaler = self._pool_scaler(download_mid_artifacts)
             to_upload = self.calculate_statistics()
+            to_upload.update(scaler)
             url = gen_artifacts_url(
                 self.run_id, self.cur_seq, self.get_round())
             self.logger.info("Upload: {} \n to: {}".format(to_upload, url))
-            if self.save_artifacts(url, json.dumps(to_upload)):
+            if self.save_artifacts(url, orjson.dumps(to_upload, option=orjson.OPT_SERIALIZE_NUMPY).decode()):
                 self.upload(True)
                 return True
             else:
                 return False
         else:
             self.logger.warning(
-                "Not able to calculate dual coefficients and intercept due to invalid mid artifact")
+                "Not able to calculate coef and intercept due to invalid mid artifact")
             return False
\ No newline at end of file
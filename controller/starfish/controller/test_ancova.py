@@ -7,9 +7,11 @@ from pathlib import Path
 from django.test import TestCase
 from unittest.mock import patch
 
+import orjson
 import statsmodels.api as sm
 from sklearn.model_selection import train_test_split
 
+from starfish.controller.file.file_utils import decode_array
 from starfish.controller.tasks.ancova.task import Ancova
 
 
@@ -71,9 +73,7 @@ class AncovaTestBase(TestCase):
         ancova.y_test = y_test
         ancova.sample_size = n
         ancova.n_group_cols = 1
-        ancova.X_with_const = sm.add_constant(X_train)
-        model = sm.OLS(y_train, ancova.X_with_const)
-        ancova.model_result = model.fit()
+        ancova._core = ancova._fit_core()
 
 
 # ---------------------------------------------------------------------------
@@ -108,13 +108,25 @@ class AncovaaPrepareDataTest(AncovaTestBase):
 
     @patch.object(Ancova, 'is_first_round', return_value=True)
     @patch.object(Ancova, 'read_dataset')
-    def test_adds_constant_to_design_matrix(self, mock_read, _):
-        mock_read.return_value = make_ancova_data(n=100)
+    def test_stores_training_design_as_float64(self, mock_read, _):
+        X, y = make_ancova_data(n=100)
+        mock_read.return_value = (X.astype(object), y)
         ancova = self._make_ancova()
         ancova.prepare_data()
-        # X_with_const should have one more column than X (the constant)
+        # the intercept is added implicitly by _fit_core, not as a column
+        self.assertEqual(ancova.X.dtype, np.float64)
+        self.assertEqual(ancova.X.shape[1], X.shape[1])
+
+    @patch.object(Ancova, 'is_first_round', return_value=True)
+    @patch.object(Ancova, 'read_dataset')
+    def test_splits_80_20_into_disjoint_train_and_test_rows(self, mock_read, _):
+        mock_read.return_value = make_ancova_data(n=101)
+        ancova = self._make_ancova()
+        ancova.prepare_data()
+        self.assertEqual(len(ancova.y), 80)
+        self.assertEqual(len(ancova.y_test), 21)
         self.assertEqual(
-            ancova.X_with_const.shape[1], ancova.X.shape[1] + 1)
+            sorted(np.concatenate([ancova.tr_idx, ancova.te_idx])), list(range(101)))
 
     @patch.object(Ancova, 'is_first_round', return_value=True)
     @patch.object(Ancova, 'read_dataset')
@@ -144,11 +156,35 @@ class AncovaTrainingTest(AncovaTestBase):
         X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
         fresh.X = X_train
         fresh.y = y_train
-        fresh.X_with_const = sm.add_constant(X_train)
         fresh.sample_size = 100
         fresh.n_group_cols = 1
         self.assertTrue(fresh.training())
 
+    def test_fit_core_matches_statsmodels(self):
+        reference = sm.OLS(self.ancova.y, sm.add_constant(self.ancova.X)).fit()
+        core = self.ancova._core
+        np.testing.assert_allclose(core['beta'], reference.params, rtol=1e-8)
+        np.testing.assert_allclose(core['se'], reference.bse, rtol=1e-8)
+        np.testing.assert_allclose(core['t'], reference.tvalues, rtol=1e-8)
+        np.testing.assert_allclose(core['resid'], reference.resid, atol=1e-10)
+        self.assertAlmostEqual(core['ssr'], reference.ssr, places=8)
+        self.assertAlmostEqual(core['ess'], reference.ess, places=8)
+        self.assertEqual(core['df_resid'], reference.df_resid)
+        self.assertEqual(core['df_model'], reference.df_model)
+
+    def test_calculate_statistics_matches_statsmodels(self):
+        reference = sm.OLS(self.ancova.y, sm.add_constant(self.ancova.X)).fit()
+        stats = self.ancova.calculate_statistics()
+        np.testing.assert_allclose(stats['p_values'], reference.pvalues, rtol=1e-6, atol=1e-12)
+        # per-coefficient fields are reported in float32
+        np.testing.assert_allclose(stats['conf_int_lower'], reference.conf_int()[:, 0], rtol=1e-6)
+        np.testing.assert_allclose(stats['conf_int_upper'], reference.conf_int()[:, 1], rtol=1e-6)
+        self.assertAlmostEqual(stats['adj_r_squared'], reference.rsquared_adj, places=10)
+        self.assertAlmostEqual(stats['f_statistic'], reference.fvalue, places=6)
+        self.assertAlmostEqual(stats['partial_eta_squared'],
+                               reference.tvalues[1] ** 2 / (reference.tvalues[1] ** 2 + reference.df_resid),
+                               places=10)
+
     def test_calculate_statistics_contains_required_keys(self):
         stats = self.ancova.calculate_statistics()
         expected = {
@@ -171,13 +207,91 @@ class AncovaTrainingTest(AncovaTestBase):
 
     def test_calculate_statistics_output_is_json_serialisable(self):
         stats = self.ancova.calculate_statistics()
-        json.dumps(stats)  # must not raise
+        saved = json.loads(orjson.dumps(stats, option=orjson.OPT_SERIALIZE_NUMPY))
+        self.assertEqual(len(saved['coef_']), len(stats['coef_']))
+
+    def test_calculate_statistics_reports_coefficients_in_float32(self):
+        stats = self.ancova.calculate_statistics()
+        self.assertEqual(stats['coef_'].dtype, np.float32)
+        self.assertEqual(stats['p_values'].dtype, np.float64)
+        np.testing.assert_allclose(stats['coef_'], self.ancova._core['beta'], rtol=1e-6)
+
+    def test_calculate_statistics_keeps_tiny_p_values_for_strong_effects(self):
+        X, y = make_ancova_data(n=200)
+        strong = self._make_ancova()
+        strong.X, strong.y, strong.sample_size, strong.n_group_cols = X, y + 1.0 * X[:, 0], 200, 1
+        strong._core = strong._fit_core()
+        stats = strong.calculate_statistics()
+        reference = sm.OLS(strong.y, sm.add_constant(X)).fit()
+        self.assertLess(reference.pvalues[1], 1e-45)  # below the float32 range
+        self.assertGreater(reference.pvalues[1], 0.0)
+        self.assertGreater(stats['p_values'][1], 0.0)
+        np.testing.assert_allclose(stats['p_values'][1], reference.pvalues[1], rtol=1e-6)
+        saved = json.loads(orjson.dumps(stats, option=orjson.OPT_SERIALIZE_NUMPY))
+        self.assertGreater(saved['p_values'][1], 0.0)
 
     def test_calculate_statistics_ss_total_equals_model_plus_residual(self):
         stats = self.ancova.calculate_statistics()
         self.assertAlmostEqual(
             stats['ss_total'], stats['ss_model'] + stats['ss_residual'], places=6)
 
+    def _fit_design(self, X, y, n_group_cols=1):
+        ancova = self._make_ancova()
+        ancova.X, ancova.y = X, y
+        ancova.sample_size = len(y)
+        ancova.n_group_cols = n_group_cols
+        ancova._core = ancova._fit_core()
+        return ancova
+
+    def test_full_one_hot_design_is_solved_as_rank_deficient(self):
+        X, y = make_ancova_data(n=120)
+        one_hot = np.column_stack([X[:, 0], 1.0 - X[:, 0], X[:, 1:]])
+        ancova = self._fit_design(one_hot, y, n_group_cols=2)
+        reference = sm.OLS(y, sm.add_constant(one_hot, has_constant='add')).fit()
+        core = ancova._core
+        self.assertEqual(core['df_model'], reference.df_model)
+        self.assertEqual(core['df_resid'], reference.df_resid)
+        self.assertAlmostEqual(core['ssr'], reference.ssr, places=8)
+        np.testing.assert_allclose(core['resid'], reference.resid, atol=1e-8)
+        # covariate effects are identified, so their SEs do not depend on the g-inverse
+        np.testing.assert_allclose(core['se'][3:], reference.bse[3:], rtol=1e-6)
+        self.assertLess(np.max(core['se']), 1.0)
+
+    def test_group_level_without_rows_does_not_fail_training(self):
+        X, y = make_ancova_data(n=120)
+        empty_level = np.column_stack([X[:, 0], np.zeros(len(y)), X[:, 1:]])
+        ancova = self._fit_design(empty_level, y, n_group_cols=2)
+        reference = sm.OLS(y, sm.add_constant(empty_level)).fit()
+        self.assertEqual(ancova._core['df_model'], reference.df_model)
+        np.testing.assert_allclose(ancova._core['beta'][[0, 1, 3, 4]], reference.params[[0, 1, 3, 4]], rtol=1e-8)
+        np.testing.assert_allclose(ancova._core['se'][[0, 1, 3, 4]], reference.bse[[0, 1, 3, 4]], rtol=1e-8)
+        self.assertGreater(ancova.calculate_statistics()['partial_eta_squared'], 0.0)
+        with patch.object(Ancova, 'save_artifacts', return_value=True):
+            self.assertTrue(ancova.training())
+
+    def test_cholesky_failure_keeps_the_pseudo_inverse_rank(self):
+        X, y = make_ancova_data(n=120)
+        with patch('scipy.linalg.cho_factor', side_effect=np.linalg.LinAlgError):
+            ancova = self._fit_design(X, y)
+        reference = sm.OLS(y, sm.add_constant(X)).fit()
+        self.assertEqual(ancova._core['df_model'], reference.df_model)
+        self.assertEqual(ancova._core['df_resid'], reference.df_resid)
+        np.testing.assert_allclose(ancova._core['se'], reference.bse, rtol=1e-8)
+
+    def test_constant_outcome_gives_nan_instead_of_raising(self):
+        X, _ = make_ancova_data(n=80)
+        ancova = self._fit_design(X, np.full(80, 2.5))
+        stats = ancova.calculate_statistics()
+        self.assertTrue(np.isnan(stats['r_squared']))
+
+    def test_saturated_design_gives_nan_instead_of_raising(self):
+        X, y = make_ancova_data(n=4)
+        ancova = self._fit_design(X, y)
+        self.assertEqual(ancova._core['df_resid'], 0)
+        stats = ancova.calculate_statistics()
+        self.assertTrue(np.all(np.isnan(stats['std_err'])))
+        self.assertTrue(np.isnan(stats['adj_r_squared']))
+
 
 # ---------------------------------------------------------------------------
 # do_aggregate  (inverse-variance weighted meta-analysis)
@@ -192,7 +306,8 @@ class AncovaAggregationTest(AncovaTestBase):
     def _write_mid_artifact(self, filename, payload):
         dir_path = Path(self.tmp_dir) / 'all-mid-artifacts' / '7' / '1'
         dir_path.mkdir(parents=True, exist_ok=True)
-        (dir_path / filename).write_text(json.dumps(payload))
+        (dir_path / filename).write_text(
+            orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode())
 
     def _empty_artifact_dir(self):
         (Path(self.tmp_dir) / 'all-mid-artifacts' / '7' / '1').mkdir(
@@ -212,6 +327,103 @@ class AncovaAggregationTest(AncovaTestBase):
             'partial_eta_squared': partial_eta,
         }
 
+    def _site_artifact(self, seed, n=100):
+        site = self._make_ancova()
+        self._setup_trained_ancova(site, n=n, seed=seed)
+        return site, site.calculate_statistics()
+
+    def test_calculate_statistics_includes_sufficient_statistics(self):
+        stats = self.ancova.calculate_statistics()
+        X, y = self.ancova.X, self.ancova.y
+        k = X.shape[1]
+        Xc, yc = X - X.mean(axis=0), y - y.mean()
+        np.testing.assert_allclose(decode_array(stats['mean_x_b64'], (k,), np.float64), X.mean(axis=0))
+        np.testing.assert_allclose(decode_array(stats['Sxx_b64'], (k, k), np.float64), Xc.T @ Xc)
+        np.testing.assert_allclose(decode_array(stats['Sxy_b64'], (k,), np.float64), Xc.T @ yc)
+        self.assertEqual(stats['n_obs'], len(y))
+        self.assertAlmostEqual(stats['mean_y'], float(y.mean()))
+        self.assertAlmostEqual(stats['Syy'], float(yc @ yc))
+
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_sufficient_statistics_pooling_equals_ols_on_concatenated_data(self, _):
+        site_a, stats_a = self._site_artifact(seed=1, n=120)
+        site_b, stats_b = self._site_artifact(seed=2, n=80)
+        self._write_mid_artifact('sA-1-1-mid-artifacts', stats_a)
+        self._write_mid_artifact('sB-1-1-mid-artifacts', stats_b)
+        result_path = Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts'
+        self.assertTrue(self.ancova.do_aggregate())
+        saved = json.loads(result_path.read_text())
+
+        reference = sm.OLS(np.concatenate([site_a.y, site_b.y]),
+                           sm.add_constant(np.vstack([site_a.X, site_b.X]))).fit()
+        self.assertEqual(saved['method'], 'pooled_ols')
+        self.assertEqual(saved['total_sample_size'], len(site_a.y) + len(site_b.y))
+        np.testing.assert_allclose(saved['coef_'], reference.params, rtol=1e-8)
+        np.testing.assert_allclose(saved['std_err'], reference.bse, rtol=1e-6)
+        np.testing.assert_allclose(saved['p_values'], reference.pvalues, rtol=1e-5, atol=1e-12)
+        self.assertAlmostEqual(saved['r_squared'], reference.rsquared, places=8)
+        self.assertAlmostEqual(saved['f_statistic'], reference.fvalue, places=4)
+        self.assertAlmostEqual(saved['ss_residual'], reference.ssr, places=6)
+
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_sufficient_statistics_pooling_is_accurate_for_large_offsets(self, _):
+        sites = []
+        for seed in (1, 2, 3):
+            site = self._make_ancova()
+            X, y = make_ancova_data(n=200, seed=seed)
+            X[:, 1] += 1e6
+            site.X, site.y, site.sample_size, site.n_group_cols = X, y + 1e7, 200, 1
+            site._core = site._fit_core()
+            self._write_mid_artifact(f's{seed}-1-1-mid-artifacts', site.calculate_statistics())
+            sites.append(site)
+        self.assertTrue(self.ancova.do_aggregate())
+        saved = json.loads((Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts').read_text())
+
+        # statsmodels itself loses ~1e-7 of the SSR at these offsets, so the
+        # reference is least squares on the centred concatenated data
+        X = np.vstack([s.X for s in sites])
+        y = np.concatenate([s.y for s in sites])
+        Xc, yc = X - X.mean(axis=0), y - y.mean()
+        slopes = np.linalg.lstsq(Xc, yc, rcond=None)[0]
+        resid = yc - Xc @ slopes
+        ssr = float(resid @ resid)
+        se = np.sqrt(ssr / (len(y) - X.shape[1] - 1) * np.diag(np.linalg.inv(Xc.T @ Xc)))
+        self.assertAlmostEqual(saved['ss_residual'] / ssr, 1.0, places=8)
+        self.assertAlmostEqual(saved['r_squared'], 1.0 - ssr / float(yc @ yc), places=8)
+        np.testing.assert_allclose(saved['coef_'][1:], slopes, rtol=1e-6)
+        np.testing.assert_allclose(saved['std_err'][1:], se, rtol=1e-6)
+
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_sufficient_statistics_pooling_handles_collinear_design(self, _):
+        designs = []
+        for i, seed in enumerate((1, 2)):
+            X, y = make_ancova_data(n=100, seed=seed)
+            X = np.column_stack([X[:, 0], 1.0 - X[:, 0], X[:, 1:]])
+            site = self._make_ancova()
+            site.X, site.y, site.sample_size, site.n_group_cols = X, y, 100, 2
+            site._core = site._fit_core()
+            self._write_mid_artifact(f's{i}-1-1-mid-artifacts', site.calculate_statistics())
+            designs.append((X, y))
+        self.assertTrue(self.ancova.do_aggregate())
+        saved = json.loads((Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts').read_text())
+
+        reference = sm.OLS(np.concatenate([y for _, y in designs]),
+                           sm.add_constant(np.vstack([X for X, _ in designs]), has_constant='add')).fit()
+        self.assertEqual(saved['df_model'], reference.df_model)
+        self.assertAlmostEqual(saved['ss_residual'], reference.ssr, places=6)
+        np.testing.assert_allclose(saved['std_err'][3:], reference.bse[3:], rtol=1e-6)
+
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_falls_back_to_inverse_variance_without_sufficient_statistics(self, _):
+        _, stats_a = self._site_artifact(seed=1)
+        self._write_mid_artifact('sA-1-1-mid-artifacts', stats_a)
+        self._write_mid_artifact('sB-1-1-mid-artifacts',
+            self._make_artifact([1.0, 0.5, 0.3, 0.1], [0.2, 0.1, 0.15, 0.1], 80))
+        result_path = Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts'
+        self.assertTrue(self.ancova.do_aggregate())
+        saved = json.loads(result_path.read_text())
+        self.assertEqual(saved['method'], 'inverse_variance')
+
     def test_returns_false_when_no_artifacts(self):
         self._empty_artifact_dir()
         self.assertFalse(self.ancova.do_aggregate())
@@ -244,6 +456,28 @@ class AncovaAggregationTest(AncovaTestBase):
         saved = json.loads(result_path.read_text())
         self.assertAlmostEqual(saved['coef_'][0], 4.5 / 4.25, places=9)
 
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_pooling_is_per_coefficient_with_zero_weight_fallback(self, _):
+        """
+        Coefficient 0 pools with weights 4 and 0.25; coefficient 1 has no
+        positive standard error at any site and falls back to the plain mean
+        with SE = 0, z = 0, p = 1.
+        """
+        self._write_mid_artifact('sA-1-1-mid-artifacts',
+            self._make_artifact([1.0, 3.0], [0.5, 0.0], 60))
+        self._write_mid_artifact('sB-1-1-mid-artifacts',
+            self._make_artifact([2.0, 5.0], [2.0, 0.0], 40))
+        result_path = Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts'
+        self.ancova.do_aggregate()
+        saved = json.loads(result_path.read_text())
+        self.assertAlmostEqual(saved['coef_'][0], 4.5 / 4.25, places=9)
+        self.assertAlmostEqual(saved['std_err'][0], np.sqrt(1 / 4.25), places=9)
+        self.assertAlmostEqual(saved['coef_'][1], 4.0, places=9)
+        self.assertEqual(saved['std_err'][1], 0.0)
+        self.assertEqual(saved['z_values'][1], 0.0)
+        self.assertEqual(saved['p_values'][1], 1.0)
+        self.assertEqual(saved['conf_int_lower'][1], saved['conf_int_upper'][1])
+
     @patch.object(Ancova, 'upload', return_value=True)
     def test_pooled_sample_size_is_sum(self, _):
         self._write_mid_artifact('s1-1-1-mid-artifacts',
@@ -274,3 +508,17 @@ class AncovaAggregationTest(AncovaTestBase):
         self.ancova.do_aggregate()
         saved = json.loads(result_path.read_text())
         self.assertAlmostEqual(saved['f_statistic'], 24.0, places=6)
+
+    @patch.object(Ancova, 'upload', return_value=True)
+    def test_pooled_f_pvalue_does_not_underflow_for_large_f(self, _):
+        """1 - cdf rounds to exactly 0 here; the survival function does not."""
+        self._write_mid_artifact('sA-1-1-mid-artifacts',
+            self._make_artifact([1.0], [0.5], 60,
+                                ss_model=1e4, ss_residual=1.0, df_residual=58))
+        self._write_mid_artifact('sB-1-1-mid-artifacts',
+            self._make_artifact([2.0], [2.0], 40,
+                                ss_model=1e4, ss_residual=1.0, df_residual=38))
+        result_path = Path(self.tmp_dir) / '42' / '1' / '1' / 'artifacts'
+        self.ancova.do_aggregate()
+        saved = json.loads(result_path.read_text())
+        self.assertGreater(saved['f_pvalue'], 0.0)
@@ -7,11 +7,13 @@ from pathlib import Path
 from django.test import TestCase
 from unittest.mock import patch
 
-import sklearn.svm
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
-from starfish.controller.tasks.svm_regression.task import SvmRegression
+from starfish.controller.file.file_utils import encode_array, decode_array
+from starfish.controller.tasks.svm_regression.task import SvmRegression, N_COMPONENTS
 
 
 # ---------------------------------------------------------------------------
@@ -61,7 +63,7 @@ class SvmRegressionTestBase(TestCase):
         svm.y_train = y_train
         svm.y_test = y_test
         svm.sample_size = n
-        svm.svmRegr = sklearn.svm.SVR(kernel='rbf', C=1.0, epsilon=0.1)
+        svm.svmRegr = svm._build_model(features)
         svm.svmRegr.fit(svm.X_train_scaled, svm.y_train)
 
 
@@ -101,13 +103,73 @@ class SvmRegressionPrepareDataTest(SvmRegressionTestBase):
     @patch.object(SvmRegression, 'is_first_round', return_value=True)
     @patch.object(SvmRegression, 'read_dataset')
     def test_initialises_svr_model_with_correct_params(self, mock_read, _):
+        mock_read.return_value = make_numeric_data(features=3)
+        svm = self._make_svm()
+        svm.prepare_data()
+        feature_map, sgd = svm.svmRegr[0], svm.svmRegr[-1]
+        self.assertIsInstance(feature_map, RBFSampler)
+        self.assertAlmostEqual(feature_map.gamma, 1.0 / 3)
+        self.assertEqual(feature_map.n_components, N_COMPONENTS)
+        self.assertIsInstance(sgd, SGDRegressor)
+        self.assertEqual(sgd.loss, 'epsilon_insensitive')
+        self.assertEqual(sgd.epsilon, 0.1)
+
+    @patch.object(SvmRegression, 'get_previous_seq_and_round', return_value=(1, 1))
+    @patch.object(SvmRegression, 'is_first_round', return_value=False)
+    @patch.object(SvmRegression, 'read_dataset')
+    def test_loads_previous_global_weights_as_warm_start(self, mock_read, _first, _prev):
         mock_read.return_value = make_numeric_data()
+        dir_path = Path(self.tmp_dir) / 'artifacts' / '42' / '1' / '1'
+        dir_path.mkdir(parents=True, exist_ok=True)
+        (dir_path / 'site1-1-1-artifacts').write_text(json.dumps(
+            {'coef_b64': encode_array(np.full(N_COMPONENTS, 0.5)),
+             'coef_shape': [N_COMPONENTS], 'intercept_': 1.5}))
+        svm = self._make_svm()
+        self.assertTrue(svm.prepare_data())
+        np.testing.assert_array_equal(svm.coef_init, [0.5] * N_COMPONENTS)
+        np.testing.assert_array_equal(svm.intercept_init, [1.5])
+
+    @patch.object(SvmRegression, 'is_first_round', return_value=True)
+    @patch.object(SvmRegression, 'read_dataset')
+    def test_first_round_scaling_matches_standard_scaler(self, mock_read, _):
+        X, y = make_numeric_data()
+        mock_read.return_value = (X, y)
+        svm = self._make_svm()
+        svm.prepare_data()
+        scaler = StandardScaler().fit(X[svm.tr_idx])
+        np.testing.assert_allclose(svm.X_train_scaled, scaler.transform(X[svm.tr_idx]), atol=1e-12)
+        np.testing.assert_allclose(svm.X_test_scaled, scaler.transform(X[svm.te_idx]), atol=1e-12)
+        np.testing.assert_allclose(svm.mean_x, X[svm.tr_idx].mean(axis=0))
+        np.testing.assert_allclose(svm.m2_x, X[svm.tr_idx].var(axis=0) * len(svm.tr_idx))
+
+    @patch.object(SvmRegression, 'is_first_round', return_value=True)
+    @patch.object(SvmRegression, 'read_dataset')
+    def test_scaling_is_accurate_for_large_offset_features(self, mock_read, _):
+        X, y = make_numeric_data()
+        X[:, 0] += 1e9  # e.g. Unix timestamps: large mean, unit spread
+        mock_read.return_value = (X, y)
+        svm = self._make_svm()
+        svm.prepare_data()
+        scaler = StandardScaler().fit(X[svm.tr_idx])
+        np.testing.assert_allclose(svm.X_train_scaled, scaler.transform(X[svm.tr_idx]), atol=1e-6)
+        np.testing.assert_allclose(np.sqrt(svm.m2_x / svm.n_train), scaler.scale_, rtol=1e-6)
+
+    @patch.object(SvmRegression, 'get_previous_seq_and_round', return_value=(1, 1))
+    @patch.object(SvmRegression, 'is_first_round', return_value=False)
+    @patch.object(SvmRegression, 'read_dataset')
+    def test_later_rounds_scale_with_global_statistics(self, mock_read, _first, _prev):
+        X, y = make_numeric_data()
+        mock_read.return_value = (X, y)
+        dir_path = Path(self.tmp_dir) / 'artifacts' / '42' / '1' / '1'
+        dir_path.mkdir(parents=True, exist_ok=True)
+        (dir_path / 'site1-1-1-artifacts').write_text(json.dumps(
+            {'coef_b64': encode_array(np.zeros(N_COMPONENTS)),
+             'coef_shape': [N_COMPONENTS], 'intercept_': 0.0,
+             'scaler_mean': [1.0, 2.0, 3.0], 'scaler_std': [2.0, 4.0, 0.5]}))
         svm = self._make_svm()
         svm.prepare_data()
-        self.assertIsInstance(svm.svmRegr, sklearn.svm.SVR)
-        self.assertEqual(svm.svmRegr.kernel, 'rbf')
-        self.assertEqual(svm.svmRegr.C, 1.0)
-        self.assertEqual(svm.svmRegr.epsilon, 0.1)
+        expected = (X[svm.te_idx] - [1.0, 2.0, 3.0]) / [2.0, 4.0, 0.5]
+        np.testing.assert_allclose(svm.X_test_scaled, expected)
 
 
 # ---------------------------------------------------------------------------
@@ -121,31 +183,31 @@ class SvmRegressionTrainingTest(SvmRegressionTestBase):
         self._setup_trained_svm(self.svm)
 
     def test_training_returns_true(self):
-        self.svm.svmRegr = sklearn.svm.SVR(kernel='rbf', C=1.0, epsilon=0.1)
+        self.svm.svmRegr = self.svm._build_model(3)
         self.assertTrue(self.svm.training())
 
     def test_training_produces_fitted_model(self):
-        self.svm.svmRegr = sklearn.svm.SVR(kernel='rbf', C=1.0, epsilon=0.1)
+        self.svm.svmRegr = self.svm._build_model(3)
         self.svm.training()
-        self.assertIsNotNone(self.svm.svmRegr.support_vectors_)
+        self.assertEqual(self.svm.svmRegr[-1].coef_.shape, (N_COMPONENTS,))
 
     def test_calculate_statistics_contains_required_keys(self):
         stats = self.svm.calculate_statistics()
         expected = {
-            'sample_size', 'dual_coef', 'intercept',
+            'sample_size', 'coef_b64', 'coef_shape', 'intercept_',
             'metric_mse', 'metric_rmse', 'metric_mae', 'metric_r2',
         }
         self.assertTrue(expected.issubset(stats.keys()))
 
-    def test_calculate_statistics_dual_coef_is_nested_list(self):
+    def test_calculate_statistics_coef_round_trips_as_float32(self):
         stats = self.svm.calculate_statistics()
-        self.assertIsInstance(stats['dual_coef'], list)
-        # dual_coef_ has shape (1, n_support_vectors) → nested list
-        self.assertIsInstance(stats['dual_coef'][0], list)
+        self.assertEqual(stats['coef_shape'], [N_COMPONENTS])
+        coef = decode_array(stats['coef_b64'], stats['coef_shape'])
+        np.testing.assert_allclose(coef, self.svm.svmRegr[-1].coef_, rtol=1e-6)
 
     def test_calculate_statistics_intercept_is_float(self):
         stats = self.svm.calculate_statistics()
-        self.assertIsInstance(stats['intercept'], float)
+        self.assertIsInstance(stats['intercept_'], float)
 
     def test_calculate_statistics_rmse_equals_sqrt_of_mse(self):
         stats = self.svm.calculate_statistics()
@@ -156,6 +218,15 @@ class SvmRegressionTrainingTest(SvmRegressionTestBase):
         stats = self.svm.calculate_statistics()
         json.dumps(stats)  # must not raise
 
+    @patch.object(SvmRegression, 'save_artifacts', return_value=True)
+    def test_training_uploads_scaler_sufficient_statistics(self, mock_save):
+        self.svm.n_train, self.svm.mean_x, self.svm.m2_x = 80, np.ones(3), np.full(3, 2.0)
+        self.svm.training()
+        uploaded = json.loads(mock_save.call_args[0][1])
+        self.assertEqual(uploaded['n'], 80)
+        self.assertEqual(uploaded['mean_x'], [1.0, 1.0, 1.0])
+        self.assertEqual(uploaded['m2_x'], [2.0, 2.0, 2.0])
+
 
 # ---------------------------------------------------------------------------
 # do_aggregate  (federated weighted averaging)
@@ -168,12 +239,13 @@ class SvmRegressionAggregationTest(SvmRegressionTestBase):
         self._setup_trained_svm(self.svm)
         self.svm.sample_size = 0
 
-    def _write_mid_artifact(self, filename, dual_coef, intercept, sample_size):
-        """dual_coef should be a nested list [[...]], intercept a float."""
+    def _write_mid_artifact(self, filename, coef, intercept, sample_size):
+        """coef should be a flat list, intercept a float."""
         dir_path = Path(self.tmp_dir) / 'all-mid-artifacts' / '7' / '1'
         dir_path.mkdir(parents=True, exist_ok=True)
         (dir_path / filename).write_text(json.dumps(
-            {'sample_size': sample_size, 'dual_coef': dual_coef, 'intercept': intercept}))
+            {'sample_size': sample_size, 'coef_b64': encode_array(coef),
+             'coef_shape': [len(coef)], 'intercept_': intercept}))
 
     def _empty_artifact_dir(self):
         (Path(self.tmp_dir) / 'all-mid-artifacts' / '7' / '1').mkdir(
@@ -185,41 +257,73 @@ class SvmRegressionAggregationTest(SvmRegressionTestBase):
 
     @patch.object(SvmRegression, 'upload', return_value=True)
     def test_returns_true_with_single_participant(self, _):
-        """Write the fitted model's own dual_coef so shape is preserved for predict."""
-        actual_dual_coef = self.svm.svmRegr.dual_coef_.tolist()
-        actual_intercept = float(self.svm.svmRegr.intercept_[0])
+        actual_coef = self.svm.svmRegr[-1].coef_.tolist()
+        actual_intercept = float(self.svm.svmRegr[-1].intercept_[0])
         self._write_mid_artifact(
-            'site1-1-1-mid-artifacts', actual_dual_coef, actual_intercept, 80)
+            'site1-1-1-mid-artifacts', actual_coef, actual_intercept, 80)
         self.assertTrue(self.svm.do_aggregate())
 
+    @patch.object(SvmRegression, 'upload', return_value=True)
+    def test_weighted_coef_averaging_two_sites(self, _):
+        """
+        Site A: n=60, coef=1.0 everywhere
+        Site B: n=40, coef=-1.5 everywhere
+        Expected: (1.0*60 - 1.5*40) / 100 = 0.0
+        """
+        self._write_mid_artifact('siteA-1-1-mid-artifacts', [1.0] * N_COMPONENTS, 1.0, 60)
+        self._write_mid_artifact('siteB-1-1-mid-artifacts', [-1.5] * N_COMPONENTS, 3.0, 40)
+        self.assertTrue(self.svm.do_aggregate())
+        np.testing.assert_allclose(self.svm.svmRegr[-1].coef_, np.zeros(N_COMPONENTS))
+
     @patch.object(SvmRegression, 'upload', return_value=True)
     @patch.object(SvmRegression, 'save_artifacts', return_value=True)
     @patch.object(SvmRegression, 'calculate_statistics',
-                  return_value={'sample_size': 100, 'dual_coef': [[0.0]],
-                                'intercept': 0.0, 'metric_mse': 0.1,
+                  return_value={'sample_size': 100, 'coef_b64': '', 'coef_shape': [0],
+                                'intercept_': 0.0, 'metric_mse': 0.1,
                                 'metric_rmse': 0.316, 'metric_mae': 0.2, 'metric_r2': 0.9})
     def test_weighted_intercept_averaging_two_sites(self, _mock_stats, _mock_save, _mock_up):
         """
-        calculate_statistics is mocked to avoid predict() with mismatched
-        support_vectors (SVR dual_coef shapes differ across sites).
-
         Site A: n=60, intercept=1.0
         Site B: n=40, intercept=3.0
         Expected: (1.0*60 + 3.0*40) / 100 = 1.8
         """
-        self._write_mid_artifact('siteA-1-1-mid-artifacts', [[0.5, -0.3]], 1.0, 60)
-        self._write_mid_artifact('siteB-1-1-mid-artifacts', [[1.5, -0.9]], 3.0, 40)
+        self._write_mid_artifact('siteA-1-1-mid-artifacts', [0.5, -0.3], 1.0, 60)
+        self._write_mid_artifact('siteB-1-1-mid-artifacts', [1.5, -0.9], 3.0, 40)
         self.svm.do_aggregate()
-        self.assertAlmostEqual(float(self.svm.svmRegr.intercept_[0]), 1.8)
+        self.assertAlmostEqual(float(self.svm.svmRegr[-1].intercept_[0]), 1.8)
 
     @patch.object(SvmRegression, 'upload', return_value=True)
     @patch.object(SvmRegression, 'save_artifacts', return_value=True)
     @patch.object(SvmRegression, 'calculate_statistics',
-                  return_value={'sample_size': 100, 'dual_coef': [[0.0]],
-                                'intercept': 0.0, 'metric_mse': 0.1,
+                  return_value={'sample_size': 100, 'coef_b64': '', 'coef_shape': [0],
+                                'intercept_': 0.0, 'metric_mse': 0.1,
                                 'metric_rmse': 0.316, 'metric_mae': 0.2, 'metric_r2': 0.9})
     def test_aggregated_sample_size_equals_sum(self, _m1, _m2, _m3):
-        self._write_mid_artifact('s1-1-1-mid-artifacts', [[0.5]], 1.0, 70)
-        self._write_mid_artifact('s2-1-1-mid-artifacts', [[1.5]], 3.0, 30)
+        self._write_mid_artifact('s1-1-1-mid-artifacts', [0.5], 1.0, 70)
+        self._write_mid_artifact('s2-1-1-mid-artifacts', [1.5], 3.0, 30)
         self.svm.do_aggregate()
         self.assertEqual(self.svm.sample_size, 100)
+
+    @patch.object(SvmRegression, 'upload', return_value=True)
+    @patch.object(SvmRegression, 'save_artifacts', return_value=True)
+    def test_pools_global_scaler_from_site_moments(self, mock_save, _):
+        X_a, _y = make_numeric_data(n=60, seed=1)
+        X_b, _y = make_numeric_data(n=40, seed=2)
+        X_b = X_b * 3.0 + 5.0
+        # a large-offset feature whose spread sum(X^2)/n - mean^2 would lose
+        X_a[:, 2] += 1e9
+        X_b[:, 2] += 1e9
+        for name, X_site in (('siteA-1-1-mid-artifacts', X_a), ('siteB-1-1-mid-artifacts', X_b)):
+            self._write_mid_artifact(name, [0.0] * N_COMPONENTS, 0.0, len(X_site))
+            path = Path(self.tmp_dir) / 'all-mid-artifacts' / '7' / '1' / name
+            artifact = json.loads(path.read_text())
+            artifact.update(n=len(X_site), mean_x=X_site.mean(axis=0).tolist(),
+                            m2_x=(X_site.var(axis=0) * len(X_site)).tolist())
+            path.write_text(json.dumps(artifact))
+        self.svm.X_test = X_a[:20]
+        self.assertTrue(self.svm.do_aggregate())
+        uploaded = json.loads(mock_save.call_args[0][1])
+        scaler = StandardScaler().fit(np.vstack([X_a, X_b]))
+        np.testing.assert_allclose(uploaded['scaler_mean'], scaler.mean_)
+        np.testing.assert_allclose(uploaded['scaler_std'], scaler.scale_, rtol=1e-6)
+        np.testing.assert_allclose(self.svm.X_test_scaled, scaler.transform(X_a[:20]), atol=1e-6)
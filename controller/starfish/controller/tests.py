@@ -201,6 +201,29 @@ class FileUtilsTest(TestCase):
         # Just verify file_utils module can be imported
         self.assertIsNotNone(file_utils)
 
+    def test_encode_decode_array_round_trip(self):
+        import numpy as np
+        from starfish.controller.file.file_utils import encode_array, decode_array
+
+        a = np.arange(6, dtype=np.float64).reshape(2, 3) / 7
+        np.testing.assert_array_equal(
+            decode_array(encode_array(a, np.float64), a.shape, np.float64), a)
+        decoded = decode_array(encode_array(a), [2, 3])
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_allclose(decoded, a, rtol=1e-6)
+
+    def test_iter_json_lines_skips_blank_lines(self):
+        import tempfile
+        from pathlib import Path
+        from starfish.controller.file.file_utils import iter_json_lines
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'artifacts'
+            path.write_text('{"a": 1}\n\n{"b": [2, 3]}')
+            self.assertEqual(list(iter_json_lines(path)), [{'a': 1}, {'b': [2, 3]}])
+            path.write_text('')
+            self.assertEqual(list(iter_json_lines(path)), [])
+
     @patch('builtins.open', create=True)
     def test_file_read_write(self, mock_open):
         """Test file read/write operations"""